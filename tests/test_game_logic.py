@@ -0,0 +1,122 @@
+import random
+
+import pytest
+
+from conftest import StopInfiniteLoop
+
+
+def _make_square_snake(module, snake):
+    """Grow the snake to 4 cells bent into a 2x2 square.
+
+    The next move up puts the head onto the tail cell.
+    """
+    for direction in (module.RIGHT, module.DOWN, module.LEFT):
+        snake.grow()
+        snake.direction = direction
+        assert not snake.move()
+    snake.direction = module.UP
+    return snake.positions[-1]
+
+
+def test_head_may_enter_leaving_tail_cell(_the_snake, snake):
+    tail = _make_square_snake(_the_snake, snake)
+    assert not snake.move(), (
+        'Голова змейки, заходящая в клетку уходящего хвоста, не должна '
+        'считаться столкновением.'
+    )
+    assert snake.get_head_position() == tail
+
+
+def test_growing_head_collides_with_tail(_the_snake, snake):
+    _make_square_snake(_the_snake, snake)
+    snake.grow()
+    assert snake.move(), (
+        'Если змейка растёт, хвост остаётся на месте, и голова, заходящая '
+        'в его клетку, должна сталкиваться с телом.'
+    )
+
+
+def _assert_consistent(module, snake):
+    occupied = set(snake.positions)
+    assert len(occupied) == len(snake.positions), (
+        'Клетки змейки не должны повторяться.'
+    )
+    assert snake.occ == sum(module.CELL_BITS[cell] for cell in occupied), (
+        'Битовая доска `occ` должна совпадать с клетками `positions`.'
+    )
+    assert len(snake.free_cells) == len(set(snake.free_cells)), (
+        'Свободные клетки не должны повторяться.'
+    )
+    assert set(snake.free_cells) == set(module.ALL_CELLS) - occupied, (
+        '`free_cells` должен содержать ровно клетки, не занятые змейкой.'
+    )
+    assert snake._free_index == {
+        cell: index for index, cell in enumerate(snake.free_cells)
+    }, '`_free_index` должен хранить индекс каждой свободной клетки.'
+
+
+def test_occupancy_stays_consistent(_the_snake, snake):
+    rng = random.Random(0)
+    directions = (_the_snake.UP, _the_snake.DOWN,
+                  _the_snake.LEFT, _the_snake.RIGHT)
+    for _ in range(5000):
+        snake.direction = rng.choice(directions)
+        if rng.random() < 0.3:
+            snake.grow()
+        if snake.move():
+            snake.reset()
+        _assert_consistent(_the_snake, snake)
+
+
+def _hamiltonian_cycle(width, height):
+    """Map each cell to the next one on a cycle through the whole field.
+
+    Rows are walked from column 1 in alternating directions, and column 0
+    leads back to the top. Requires an even height.
+    """
+    path = []
+    for y in range(height):
+        columns = range(1, width) if y % 2 == 0 else range(width - 1, 0, -1)
+        path.extend((x, y) for x in columns)
+    path.extend((0, y) for y in range(height - 1, -1, -1))
+    return {cell: path[(i + 1) % len(path)] for i, cell in enumerate(path)}
+
+
+@pytest.mark.timeout(10)
+def test_main_restarts_when_field_is_full(_the_snake, monkeypatch):
+    module = _the_snake
+    next_cell = _hamiltonian_cycle(module.GRID_WIDTH, module.GRID_HEIGHT)
+    snakes = []
+    original_reset = module.Snake.reset
+
+    def reset(self):
+        snakes.append(self)
+        if len(snakes) > 1:
+            assert len(self.positions) == len(module.ALL_CELLS), (
+                'Игра должна начинаться заново только после того, как '
+                'змейка заняла всё поле.'
+            )
+            raise StopInfiniteLoop
+        original_reset(self)
+
+    def steer(snake):
+        head_x, head_y = snake.get_head_position()
+        next_x, next_y = next_cell[head_x, head_y]
+        snake.next_direction = (next_x - head_x, next_y - head_y)
+        return False
+
+    def place_ahead(free_cells):
+        cell = next_cell[snakes[0].get_head_position()]
+        assert cell in free_cells
+        return cell
+
+    class _Clock:
+        def tick(self, *args, **kwargs):
+            return 0
+
+    monkeypatch.setattr(module.Snake, 'reset', reset)
+    monkeypatch.setattr(module, 'handle_keys', steer)
+    monkeypatch.setattr(module, 'choice', place_ahead)
+    monkeypatch.setattr(module, 'clock', _Clock())
+    with pytest.raises(StopInfiniteLoop):
+        module.main()
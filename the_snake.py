@@ -1,11 +1,29 @@
-from random import randint
-from typing import List, Tuple
+from collections import deque
+from random import choice
+from typing import Deque, Dict, List, Sequence, Tuple
 
 import pygame as pg
 
+__all__ = [
+    # Type aliases
+    'Pointer', 'Color', 'Position',
+    # Field, movement, event, color and speed constants
+    'SCREEN_WIDTH', 'SCREEN_HEIGHT', 'GRID_SIZE', 'GRID_WIDTH', 'GRID_HEIGHT',
+    'ALL_CELLS', 'CELL_BITS', 'UP', 'DOWN', 'LEFT', 'RIGHT',
+    'REDRAW_EVENTS', 'HANDLED_EVENTS', 'KEY_DIRECTIONS', 'OPPOSITE_DIRECTIONS',
+    'BOARD_BACKGROUND_COLOR', 'BORDER_COLOR', 'APPLE_COLOR', 'SNAKE_COLOR',
+    'SPEED',
+    # Window, pre-rendered cells and cell areas
+    'screen', 'clock', 'make_cell_surface', 'SNAKE_CELL_SURF',
+    'APPLE_CELL_SURF', 'CELL_RECTS',
+    # Game objects and game loop
+    'GameObject', 'Apple', 'Snake', 'handle_keys', 'draw_board', 'main',
+]
+
 # Type aliases
 Pointer = Tuple[int, int]
 Color = Tuple[int, int, int]
+# Position on the field in grid cells, not pixels
 Position = Tuple[int, int]
 
 # Constants for field and grid sizes
@@ -15,12 +33,46 @@ GRID_SIZE: int = 20
 GRID_WIDTH: int = SCREEN_WIDTH // GRID_SIZE
 GRID_HEIGHT: int = SCREEN_HEIGHT // GRID_SIZE
 
+# Every cell of the field
+ALL_CELLS: Tuple[Position, ...] = tuple(
+    (x, y)
+    for x in range(GRID_WIDTH)
+    for y in range(GRID_HEIGHT)
+)
+
+# Bit of each cell in the occupancy bitboard
+CELL_BITS: Dict[Position, int] = {
+    (x, y): 1 << (y * GRID_WIDTH + x) for x, y in ALL_CELLS
+}
+
 # Movement directions
 UP: Pointer = (0, -1)
 DOWN: Pointer = (0, 1)
 LEFT: Pointer = (-1, 0)
 RIGHT: Pointer = (1, 0)
 
+# Events after which the whole window has to be presented again
+REDRAW_EVENTS: Tuple[int, ...] = (pg.VIDEOEXPOSE, pg.WINDOWEXPOSED)
+
+# Event types the game reacts to
+HANDLED_EVENTS: Tuple[int, ...] = (pg.QUIT, pg.KEYDOWN) + REDRAW_EVENTS
+
+# Direction for each control key
+KEY_DIRECTIONS: Dict[int, Pointer] = {
+    pg.K_UP: UP,
+    pg.K_DOWN: DOWN,
+    pg.K_LEFT: LEFT,
+    pg.K_RIGHT: RIGHT,
+}
+
+# Opposite of each direction, which the snake cannot turn into
+OPPOSITE_DIRECTIONS: Dict[Pointer, Pointer] = {
+    UP: DOWN,
+    DOWN: UP,
+    LEFT: RIGHT,
+    RIGHT: LEFT,
+}
+
 # Colors
 BOARD_BACKGROUND_COLOR: Color = (0, 0, 0)
 BORDER_COLOR: Color = (93, 216, 228)
@@ -32,17 +84,42 @@ SPEED: int = 10
 
 # Game window setup
 screen: pg.Surface = pg.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), 0, 32)
-pg.display.set_caption('Snake')
 clock: pg.time.Clock = pg.time.Clock()
 
 
+def make_cell_surface(color: Color) -> pg.Surface:
+    """Pre-render a single grid cell with its border."""
+    surface = pg.Surface((GRID_SIZE, GRID_SIZE)).convert()
+    surface.fill(color)
+    pg.draw.rect(surface, BORDER_COLOR, surface.get_rect(), 1)
+    return surface
+
+
+# Pre-rendered cells, blitted instead of drawing rects every frame
+SNAKE_CELL_SURF: pg.Surface = make_cell_surface(SNAKE_COLOR)
+APPLE_CELL_SURF: pg.Surface = make_cell_surface(APPLE_COLOR)
+
+# Screen area of each cell, reused instead of creating rects every frame
+CELL_RECTS: Dict[Position, pg.Rect] = {
+    (x, y): pg.Rect(x * GRID_SIZE, y * GRID_SIZE, GRID_SIZE, GRID_SIZE)
+    for x, y in ALL_CELLS
+}
+
+
 class GameObject:
     """Base class for game objects."""
 
-    def __init__(self, body_color: Color = BOARD_BACKGROUND_COLOR) -> None:
-        """Initialize game object with position and color."""
-        self.position: Position = (SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
+    __slots__ = ('position', 'body_color', 'surface')
+
+    def __init__(
+        self,
+        body_color: Color = BOARD_BACKGROUND_COLOR,
+        surface: pg.Surface = None
+    ) -> None:
+        """Initialize game object with position, color and target surface."""
+        self.position: Position = (GRID_WIDTH // 2, GRID_HEIGHT // 2)
         self.body_color: Color = body_color
+        self.surface: pg.Surface = screen if surface is None else surface
 
     def draw(self) -> None:
         """Draw the game object. To be implemented in child classes."""
@@ -50,59 +127,74 @@ class GameObject:
             'Method must be implemented in child class'
         )
 
-    def draw_cell(self, position: Position, color: Color) -> None:
-        """Draw a single cell at given position with given color."""
-        rect = pg.Rect(position, (GRID_SIZE, GRID_SIZE))
-        pg.draw.rect(screen, color, rect)
-        pg.draw.rect(screen, BORDER_COLOR, rect, 1)
+    def draw_cell(self, position: Position, cell: pg.Surface) -> pg.Rect:
+        """Draw a single pre-rendered cell and return its area."""
+        rect = CELL_RECTS[position]
+        self.surface.blit(cell, rect)
+        return rect
 
 
 class Apple(GameObject):
     """Apple class for the snake to eat."""
 
-    def __init__(self, occupied_positions: List[Position] = None) -> None:
+    __slots__ = ('free_cells',)
+
+    def __init__(
+        self,
+        free_cells: Sequence[Position] = None,
+        surface: pg.Surface = None
+    ) -> None:
         """Initialize apple with random position."""
-        super().__init__(APPLE_COLOR)
-        self.occupied_positions: List[Position] = occupied_positions or []
+        super().__init__(APPLE_COLOR, surface)
+        self.free_cells: Sequence[Position] = free_cells or ALL_CELLS
         self.randomize_position()
 
     def randomize_position(
-        self, occupied_positions: List[Position] = None
+        self, free_cells: Sequence[Position] = None
     ) -> None:
-        """Set apple to random position on grid."""
-        if occupied_positions is not None:
-            self.occupied_positions = occupied_positions
-
-        while True:
-            self.position = (
-                randint(0, GRID_WIDTH - 1) * GRID_SIZE,
-                randint(0, GRID_HEIGHT - 1) * GRID_SIZE
-            )
-            if self.position not in self.occupied_positions:
-                break
+        """Set apple to random free position on grid."""
+        if free_cells is not None:
+            self.free_cells = free_cells
 
-    def draw(self) -> None:
-        """Draw the apple on the screen."""
-        self.draw_cell(self.position, self.body_color)
+        self.position = choice(self.free_cells)
+
+    def draw(self) -> pg.Rect:
+        """Draw the apple and return its area."""
+        return self.draw_cell(self.position, APPLE_CELL_SURF)
 
 
 class Snake(GameObject):
     """Snake class representing the player character."""
 
-    def __init__(self) -> None:
+    __slots__ = (
+        'positions', 'direction', 'next_direction', 'last', 'grew',
+        'occ', 'free_cells', '_free_index'
+    )
+
+    def __init__(self, surface: pg.Surface = None) -> None:
         """Initialize snake with starting position and direction."""
-        super().__init__(SNAKE_COLOR)
+        super().__init__(SNAKE_COLOR, surface)
         self.reset()
 
     def reset(self) -> None:
         """Reset snake to initial state."""
-        self.positions: List[Position] = [
-            (SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
-        ]
+        self.positions: Deque[Position] = deque(
+            [(GRID_WIDTH // 2, GRID_HEIGHT // 2)]
+        )
         self.direction: Pointer = RIGHT
         self.next_direction: Pointer = None
         self.last: Position = None
         self.grew: bool = False
+        # Bitboard of cells covered by the snake
+        self.occ: int = 0
+        for position in self.positions:
+            self.occ |= CELL_BITS[position]
+        self.free_cells: List[Position] = [
+            cell for cell in ALL_CELLS if not self.occ & CELL_BITS[cell]
+        ]
+        self._free_index: Dict[Position, int] = {
+            cell: index for index, cell in enumerate(self.free_cells)
+        }
 
     def update_direction(self) -> None:
         """Update direction after key press."""
@@ -110,101 +202,175 @@ class Snake(GameObject):
             self.direction = self.next_direction
             self.next_direction = None
 
+    def _occupy(self, cell: Position) -> None:
+        """Remove cell from free cells by swapping in the last one."""
+        index = self._free_index.pop(cell)
+        last_free = self.free_cells.pop()
+        if last_free != cell:
+            self.free_cells[index] = last_free
+            self._free_index[last_free] = index
+
+    def _release(self, cell: Position) -> None:
+        """Return cell to free cells."""
+        self._free_index[cell] = len(self.free_cells)
+        self.free_cells.append(cell)
+
     def get_head_position(self) -> Position:
         """Get current head position."""
         return self.positions[0]
 
-    def move(self) -> None:
-        """Move the snake one step in current direction."""
-        head_x, head_y = self.get_head_position()
+    def move(self) -> bool:
+        """Move the snake one step, return True if it ran into itself."""
+        positions = self.positions
+        head_x, head_y = positions[0]
         dir_x, dir_y = self.direction
-        new_x = (head_x + dir_x * GRID_SIZE) % SCREEN_WIDTH
-        new_y = (head_y + dir_y * GRID_SIZE) % SCREEN_HEIGHT
+        new_x = head_x + dir_x
+        new_y = head_y + dir_y
+
+        # Wrap around field edges without a modulo
+        if new_x < 0:
+            new_x = GRID_WIDTH - 1
+        elif new_x == GRID_WIDTH:
+            new_x = 0
+        if new_y < 0:
+            new_y = GRID_HEIGHT - 1
+        elif new_y == GRID_HEIGHT:
+            new_y = 0
         new_head = (new_x, new_y)
 
-        self.positions.insert(0, new_head)
-
-        self.last = self.positions.pop() if not self.grew else None
-        self.grew = False if self.grew else self.grew
+        # Test the head before moving: it may enter the cell the tail
+        # leaves, unless the snake is growing and the tail stays
+        head_bit = CELL_BITS[new_head]
+        if self.occ & head_bit and (self.grew or new_head != positions[-1]):
+            return True
+
+        if self.grew:
+            self.last = None
+            self.grew = False
+        else:
+            self.last = positions.pop()
+            self.occ &= ~CELL_BITS[self.last]
+            self._release(self.last)
+
+        self.occ |= head_bit
+        positions.appendleft(new_head)
+        self._occupy(new_head)
+        return False
 
     def grow(self) -> None:
         """Make the snake grow on next move."""
         self.grew = True
 
-    def draw(self) -> None:
-        """Draw the snake on the screen."""
-        # Draw body segments
-        for position in self.positions[:-1]:
-            self.draw_cell(position, self.body_color)
-
-        # Draw head
-        head_position = self.get_head_position()
-        head_rect = pg.Rect(head_position, (GRID_SIZE, GRID_SIZE))
-        pg.draw.rect(screen, self.body_color, head_rect)
-        pg.draw.rect(screen, BORDER_COLOR, head_rect, 1)
-
-        # Erase last segment if snake moved without growing
-        if self.last and not self.grew:
-            last_rect = pg.Rect(self.last, (GRID_SIZE, GRID_SIZE))
-            pg.draw.rect(screen, BOARD_BACKGROUND_COLOR, last_rect)
-
-    def check_collision(self) -> bool:
-        """Check if snake collides with itself."""
-        return self.get_head_position() in self.positions[1:]
-
-
-def handle_keys(game_object: Snake) -> None:
-    """Handle user input for controlling the snake."""
-    for event in pg.event.get():
-        if event.type == pg.QUIT:
+    def draw(self) -> List[pg.Rect]:
+        """Draw the last move of the snake and return changed areas."""
+        dirty = []
+
+        # Erase last segment first: the head may have entered its cell
+        if self.last is not None:
+            last_rect = CELL_RECTS[self.last]
+            self.surface.fill(BOARD_BACKGROUND_COLOR, last_rect)
+            dirty.append(last_rect)
+        dirty.append(
+            self.draw_cell(self.get_head_position(), SNAKE_CELL_SURF)
+        )
+        return dirty
+
+    def redraw(self) -> None:
+        """Draw the whole snake on the screen."""
+        # Draw all segments in a single batched call
+        self.surface.blits(
+            (
+                (SNAKE_CELL_SURF, CELL_RECTS[position])
+                for position in self.positions
+            ),
+            False
+        )
+
+
+def handle_keys(game_object: Snake) -> bool:
+    """Handle user input, return True if the board must be redrawn."""
+    redraw = False
+    for event in pg.event.get(HANDLED_EVENTS):
+        if event.type in REDRAW_EVENTS:
+            redraw = True
+        elif event.type == pg.QUIT:
             pg.quit()
             raise SystemExit
         elif event.type == pg.KEYDOWN:
-            if event.key == pg.K_UP and game_object.direction != DOWN:
-                game_object.next_direction = UP
-            elif event.key == pg.K_DOWN and game_object.direction != UP:
-                game_object.next_direction = DOWN
-            elif event.key == pg.K_LEFT and game_object.direction != RIGHT:
-                game_object.next_direction = LEFT
-            elif event.key == pg.K_RIGHT and game_object.direction != LEFT:
-                game_object.next_direction = RIGHT
+            direction = KEY_DIRECTIONS.get(event.key)
+            if (
+                direction is not None
+                and direction != OPPOSITE_DIRECTIONS[game_object.direction]
+            ):
+                game_object.next_direction = direction
+    return redraw
+
+
+def draw_board(snake: Snake, apple: Apple) -> None:
+    """Draw the whole field from scratch on the snake's surface."""
+    snake.surface.fill(BOARD_BACKGROUND_COLOR)
+    apple.draw()
+    snake.redraw()
+    pg.display.update()
 
 
 def main() -> None:
     """Main game function."""
     pg.init()
+    pg.display.set_caption('Snake')
+
+    # Drop unhandled events (mouse motion, focus, ...) at the SDL layer,
+    # keeping expose events so the board can be repainted
+    pg.event.set_blocked(None)
+    pg.event.set_allowed(HANDLED_EVENTS)
 
     # Create game objects
     snake = Snake()
-    apple = Apple(snake.positions)
+    apple = Apple(snake.free_cells)
+    draw_board(snake, apple)
+
+    # Bind per-frame callables to locals to skip global/attribute lookups
+    tick = clock.tick
+    speed = SPEED
+    handle = handle_keys
+    update = pg.display.update
+    update_direction = snake.update_direction
+    move = snake.move
+    get_head_position = snake.get_head_position
+    draw_snake = snake.draw
 
     while True:
-        clock.tick(SPEED)
+        tick(speed)
 
         # Handle user input
-        handle_keys(snake)
+        exposed = handle(snake)
 
         # Update snake direction
-        snake.update_direction()
+        update_direction()
 
-        # Move snake
-        snake.move()
+        # Move snake, starting over on self-collision or once the field
+        # is full
+        if move() or not snake.free_cells:
+            snake.reset()
+            apple.randomize_position(snake.free_cells)
+            draw_board(snake, apple)
+            continue
 
         # Check for apple collision
-        if snake.get_head_position() == apple.position:
+        ate = get_head_position() == apple.position
+        if ate:
             snake.grow()
-            apple.randomize_position(snake.positions)
-
-        # Check for self-collision
-        if snake.check_collision():
-            snake.reset()
-            apple.randomize_position(snake.positions)
-
-        # Draw everything
-        screen.fill(BOARD_BACKGROUND_COLOR)
-        apple.draw()
-        snake.draw()
-        pg.display.update()
+            apple.randomize_position(snake.free_cells)
+
+        # Draw and present only the cells changed by this move, or the
+        # whole board if the window was uncovered
+        dirty = draw_snake()
+        if ate:
+            dirty.append(apple.draw())
+        if exposed:
+            draw_board(snake, apple)
+        else:
+            update(dirty)
 
 
 if __name__ == '__main__':